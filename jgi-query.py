@@ -10,26 +10,69 @@ import sys
 import os
 import re
 import subprocess
-import textwrap
-import xml.etree.ElementTree as ET
+import shlex
+import xml.sax
 import argparse
+import configparser
 import tarfile
 import gzip
+import shutil
 import time
+import threading
+import mmap
+import hashlib
 import readline  # allows arrow keys to be used during input
-from collections import defaultdict
-from hashlib import md5
+from collections import defaultdict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
+from itertools import groupby, islice
+try:  # faster XML parsing, if available
+    from lxml import etree as LET
+    XML_PARSE_ERRORS = (xml.sax.SAXException, LET.XMLSyntaxError)
+except ImportError:
+    LET = None
+    XML_PARSE_ERRORS = (xml.sax.SAXException,)
+try:  # faster (drop-in) gzip decompression, if available
+    from isal import igzip as GZIP
+except ImportError:
+    GZIP = gzip
+
+# REGEX PATTERNS
+
+_TZ_RE = re.compile(r"\s[A-Z]{3}\s")  # timezone substring, e.g. " PST "
+_ORG_NAME_RE = re.compile(rb'<organismDownloads[^>]*?\sname="([^"]+)"')
+_TAR_GZ_RE = re.compile(r"\.tar\.gz$")  # matches .tar.gz
+_GZ_RE = re.compile(r"(?<!\.tar)\.gz$")  # excludes .tar.gz
+_ORG_ADDR_RE = re.compile(r'\.jgi.+\.(?:gov|org).*\/(.+)\/(?!\/)')
+_CURL_VERSION_RE = re.compile(r"curl (\d+)\.(\d+)")
+_SELECTION_RE = re.compile(r"^\s*(\d+)\s*:([^:]*)$")  # <category>:<indices>
+_RANGE_RE = re.compile(r"^(\d+)(?:\s*-\s*(\d+))?$")  # single index or range
+
+# /REGEX PATTERNS
+
+# <file> attributes used downstream; all others are discarded when parsing
+FILE_ATTRIBUTES = ("filename", "url", "size", "sizeInBytes",
+                   "timestamp", "md5", "label", "fileType")
+
+# month numbers for the fixed-format timestamps in JGI XML indices
+MONTH_NUMBERS = {
+    name: number for number, name in enumerate(
+        ["Jan", "Feb", "Mar", "Apr", "May", "Jun",
+         "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"], 1)
+}
+
+# units for human-readable file sizes, in steps of 1024 bytes
+SIZE_UNITS = ("B", "KB", "MB", "GB", "TB", "PB")
+
+# remote checksum and size (either may be None) used to verify a download
+Validation = namedtuple("Validation", "md5 sizeInBytes")
+NO_VALIDATION = Validation(None, None)
+
+# chunk size for copying decompressed data (large, as files may be many GB)
+COPY_BUFFER_SIZE = 1024 * 1024
 
 # FUNCTIONS
 
-def deindent(string):
-    """
-    Print left-justified triple-quoted text blocks
-
-    """
-    print(textwrap.dedent(string))
-
-
 def check_config(d, config_name):
     """
     Check filesystem for existence of configuration
@@ -37,9 +80,8 @@ def check_config(d, config_name):
     if found.
 
     """
-    files = os.listdir(d)
-    if config_name in files:
-        config_path = d + "/{}".format(config_name)
+    config_path = os.path.join(d, config_name)
+    if os.path.isfile(config_path):
         return config_path
     else:
         return None
@@ -51,21 +93,7 @@ def get_user_info():
     use with the curl query. Returns a dict.
 
     """
-    blurb = """
-    === USER SETUP ===
-
-    JGI access configuration:
-
-    Before continuing, you will need to provide your JGI login credentials.
-    These are required by JGI's curl api, and will be stored in a config
-    file for future use (unless you choose to delete them).
-
-    If you need to sign up for a JGI account, use the registration link at
-    https://contacts.jgi.doe.gov/registration/new
-
-    === CREDENTIALS ===
-    """
-    deindent(blurb)
+    print(user_setup_blurb)
     user_query = "JGI account username/email (or 'q' to quit): "
     pw_query = "JGI account password (or 'q' to quit): "
     user = input(user_query)
@@ -111,17 +139,21 @@ def read_config(config):
     from config file.
 
     """
-    user, pw, categories = None, None, None
+    # no interpolation, so that passwords may contain "%"
+    parser = configparser.ConfigParser(interpolation=None)
     with open(config) as c:
-        for line in c:
-            line = line.strip()
-            if line.startswith("user"):
-                user = line.split("=")[1]
-            if line.startswith("password"):
-                pw = line.split("=")[1]
-            if line.startswith("categories"):
-                cats = line.strip().split("=")[1]
-                categories = [e.strip() for e in cats.split(",")]
+        try:  # config file has no section header; supply one
+            parser.read_string("[jgi]\n" + c.read(), source=config)
+        except configparser.Error as e:
+            sys.exit("ERROR: Config file present ({}), but could not be "
+                     "parsed:\n{}".format(config, e))
+    entries = parser["jgi"]
+    user = entries.get("user")
+    pw = entries.get("password")
+    cats = entries.get("categories")
+    categories = None
+    if cats is not None:
+        categories = [e.strip() for e in cats.split(",")]
     if not (user and pw):
         sys.exit("ERROR: Config file present ({}), but user and/or "
                  "password not found.".format(config))
@@ -131,98 +163,115 @@ def read_config(config):
 
 # /CONFIG
 
-def xml_hunt(xml_file):
+class IndexHandler(xml.sax.ContentHandler):
     """
-    Gets list of all XML entries with "filename" attribute,
-    and returns a dictionary of the file attributes keyed
-    by a ":"-joined string of parent names.
+    SAX handler which collects the attributes of all <file> elements
+    into <matches>, a dict of {top category: {parent: [files]}}.
 
-    """
-    root = ET.iterparse(xml_file, events=("start", "end"))
-    parents = []
-    matches = {}
-    for event, element in root:
-        if element.tag not in ["folder", "file"]:  # skip topmost categories
-            continue
-        if element.tag == "folder":
-            if event == "start":  # add to parents
-                parents.append(element.attrib["name"])
-            elif event == "end":  # strip from parents
-                del parents[-1]
-            continue
-        if event == "start" and element.tag == "file":
-            parent_string = ":".join(parents)
-            try:
-                matches[parent_string].append(element.attrib)
-            except KeyError:
-                matches[parent_string] = [element.attrib]
-    return matches
+    If <filter_found> is True, only files with a folder in
+    <DESIRED_CATEGORIES> among their parents are kept.
 
-
-def format_found(d, filter_found=False):
     """
-    Reformats the output from xml_hunt()
+    def __init__(self, filter_found=False):
+        super().__init__()
+        self.filter_found = filter_found
+        self.parents = []
+        self.matches = {}
+        self.key = None  # (top, parent) for the current folder
+        self.current = None  # file list for <key>, created on first use
+
+    def update_key(self):
+        # only called when <parents> changes, not for every file
+        self.current = None
+        layers = [e for e in self.parents if e]
+        if not layers or (
+            self.filter_found and DESIRED_CATEGORIES_SET.isdisjoint(layers)
+        ):
+            self.key = None
+        elif len(layers) == 1:
+            self.key = (layers[0], layers[0])
+        else:
+            # either -2 or -1 works well for top/parent, as long as they differ
+            self.key = (layers[-2], layers[-1])
+
+    def startElement(self, name, attrs):
+        if name == "folder":  # add to parents
+            self.parents.append(attrs["name"])
+            self.update_key()
+        elif name == "file" and self.key is not None:
+            if self.current is None:
+                top, parent = self.key
+                self.current = self.matches.setdefault(
+                    top, {}).setdefault(parent, [])
+            self.current.append(
+                {k: attrs[k] for k in FILE_ATTRIBUTES if k in attrs})
+
+    def endElement(self, name):
+        if name == "folder":  # strip from parents
+            del self.parents[-1]
+            self.update_key()
+
+
+def xml_hunt(xml_file, filter_found=False):
+    """
+    Gets list of all XML entries with "filename" attribute,
+    and returns a dictionary of the file attributes grouped
+    by top category and parent (see IndexHandler).
+
+    Uses lxml if available, which filters tags during parsing;
+    otherwise the file is streamed through a SAX parser. In neither
+    case is the full XML tree kept in memory.
 
     """
-    output = {}
-    for p, c in sorted(d.items()):
-        layers = [e for e in p.split(":") if e]
-        if filter_found:
-            if not any(cat in layers for cat in DESIRED_CATEGORIES):
-                continue
-        if len(layers) == 1:
-            top = parent = layers[0]
-        else:
-            top = layers[-2]  # either -2 or -1 works well, != parent
-            parent = layers[-1]  # either -2 or -1 works well, != top
-        if top not in output:
-            output[top] = defaultdict(dict)
-        if parent not in output[top]:
-            output[top][parent] = c
-        else:
-            output[top][parent].extend(c)
-    return output
+    handler = IndexHandler(filter_found)
+    if LET is None:
+        xml.sax.parse(xml_file, handler)
+        return handler.matches
+    with open(xml_file, "rb") as f:  # closed even if parsing fails
+        context = LET.iterparse(
+            f, events=("start", "end"), tag=("folder", "file"))
+        for event, element in context:
+            if event == "start":
+                handler.startElement(element.tag, element.attrib)
+            else:
+                handler.endElement(element.tag)
+                # free processed elements and their preceding siblings
+                element.clear()
+                while element.getprevious() is not None:
+                    del element.getparent()[0]
+    return handler.matches
 
 
 def get_file_list(xml_file, filter_categories=False):
     """
     Moves through the xml document <xml_file> and returns information
     about matches to elements in <DESIRED_CATEGORIES> if
-    <filter_categories> is True, or all files otherwise
+    <filter_categories> is True, or all files otherwise.
+
+    Returns a flat dict of file attributes keyed by
+    (catID, parent, uid) tuples, and a dict of category names
+    keyed by catID. Files are inserted in display order (categories
+    and sub-categories by name, files by filename), so consumers can
+    iterate over them without re-sorting.
 
     """
-    descriptors = {}
+    files = {}
+    category_names = {}
     display_cats = ['filename', 'url', 'size',
                     'label', 'sizeInBytes', 'timestamp', 'md5']
-    found = xml_hunt(xml_file)
-    found = format_found(found, filter_categories)
-    if not list(found.values()):
-        return None
-    category_id = 0
-    for category, sub_cat in sorted(found.items()):
-        c = category
-        if c not in descriptors:
-            category_id += 1
-            descriptors[c] = defaultdict(dict)
-            descriptors[c]["catID"] = category_id
+    found = xml_hunt(xml_file, filter_categories)
+    for catID, (category, sub_cat) in enumerate(sorted(found.items()), 1):
+        category_names[catID] = category
         uid = 1
         for parent, children in sorted(sub_cat.items()):
-            descriptors[c]["results"][parent] = defaultdict(dict)
-            results = descriptors[c]["results"][parent]
             unique_children = uniqueify(children)
             for child in sorted(unique_children, key=lambda x: x['filename']):
-                try:
-                    results[uid]
-                except KeyError:
-                    results[uid] = {}
-                for dc in display_cats:
-                    try:
-                        results[uid][dc] = child[dc]
-                    except KeyError:
-                        continue
+                files[(catID, parent, uid)] = {
+                    dc: child[dc] for dc in display_cats if dc in child
+                }
                 uid += 1
 
-    return descriptors
+    return files, category_names
 
 
 def uniqueify(children):
@@ -237,8 +286,7 @@ def uniqueify(children):
     for child in children:
         try:
             fn = child['filename']
-            date = fmt_timestamp(child['timestamp'])
-            date_string = (date.tm_mon, date.tm_year)
+            date_string = fmt_timestamp(child['timestamp'])  # (month, year)
             uid = (fn, date_string)
         except KeyError:
             continue
@@ -257,33 +305,13 @@ def uniqueify(children):
     return unique.values()
 
 
-def get_sizes(d, sizes_by_url=None):
-    """
-    Builds a dictionary of url:sizes from
-    output of get_file_list()
-
-    """
-    for k, v in d.items():
-        if isinstance(v, dict):
-            if "url" in v:
-                address = v["url"]
-                try:
-                    size = int(v["sizeInBytes"])
-                except:
-                    size = None
-                sizes_by_url[address] = size
-            else:
-                get_sizes(v, sizes_by_url)
-    return sizes_by_url
-
-
 def clean_exit(exit_message=None, exit_code=0, remove_temp=True):
     """
     Perform a sys.exit() while removing temporary files and
     informing the user.
 
     """
-    to_remove = ["cookies"]
+    to_remove = ["cookies", "cookies.new"]
     # don't delete xml file if supplied by user
     if not LOCAL_XML and remove_temp is True:
         try:
@@ -309,20 +337,23 @@ def clean_exit(exit_message=None, exit_code=0, remove_temp=True):
 def extract_file(file_path, keep_compressed=False):
     """
     Native Python file decompression for tar.gz and .gz files.
+    Uses python-isal's igzip in place of gzip for .gz files if it
+    is installed (tarfile needs a seekable stream, which igzip
+    can't provide, so tar.gz files always use tarfile's own gzip).
 
     TODO: implement .zip decompression
 
     """
-    tar_pattern = "tar.gz$"  # matches tar.gz
-    gz_pattern = "(?<!tar)\.gz$"  # excludes tar.gz
     endings_map = {"tar": (tarfile, "r:gz", ".tar.gz"),
-                   "gz": (gzip, "rb", ".gz")
+                   "gz": (GZIP, "rb", ".gz")
                    }
     relative_name = os.path.basename(file_path)
-    if re.search(tar_pattern, file_path):
+    if _TAR_GZ_RE.search(file_path):
         opener, mode, ext = endings_map["tar"]
-        with opener.open(file_path) as f:
-            file_count = len(f.getmembers())
+        with opener.open(file_path, mode) as f:
+            # only need to know if there's more than one member, so
+            # avoid reading the whole member list up front
+            file_count = len(list(islice(f, 2)))
             if file_count > 1:  # make sub-directory to unpack into
                 dir_name = relative_name.rstrip(ext)
                 try:
@@ -342,23 +373,26 @@ def extract_file(file_path, keep_compressed=False):
                 return prefix == abs_directory
             
             def safe_extract(tar, path=".", members=None, *, numeric_owner=False):
-            
-                for member in tar.getmembers():
-                    member_path = os.path.join(path, member.name)
-                    if not is_within_directory(path, member_path):
-                        raise Exception("Attempted Path Traversal in Tar File")
-            
-                tar.extractall(path, members, numeric_owner=numeric_owner) 
+
+                def checked_members():
+                    # members are checked as they are read from the archive
+                    for member in (tar if members is None else members):
+                        member_path = os.path.join(path, member.name)
+                        if not is_within_directory(path, member_path):
+                            raise Exception("Attempted Path Traversal in Tar File")
+                        yield member
+
+                tar.extractall(
+                    path, checked_members(), numeric_owner=numeric_owner)
                 
             
             safe_extract(f, destination)
-    elif re.search(gz_pattern, file_path):
+    elif _GZ_RE.search(file_path):
         opener, mode, ext = endings_map["gz"]
         # out_name = file_path.rstrip(ext)
         out_name = relative_name.rstrip(ext)
-        with opener.open(file_path) as f, open(out_name, "wb") as out:
-            for l in f:
-                out.write(l)
+        with opener.open(file_path, mode) as f, open(out_name, "wb") as out:
+            shutil.copyfileobj(f, out, COPY_BUFFER_SIZE)
     else:
         print("Skipped decompression for '{}'"
               .format(file_path))
@@ -372,66 +406,77 @@ def decompress_files(local_file_list, keep_original=False):
     Decompresses list of files, and deletes compressed
     copies unless <keep_original> is True.
 
+    Files are decompressed concurrently; zlib releases the GIL
+    while inflating, so threads make use of multiple cores.
+
     """
-    for f in local_file_list:
-        extract_file(f, keep_original)
+    if not local_file_list:
+        return
+    n_workers = min(len(local_file_list), os.cpu_count() or 1)
+    extract = partial(extract_file, keep_compressed=keep_original)
+    with ThreadPoolExecutor(max_workers=n_workers) as executor:
+        list(executor.map(extract, local_file_list))  # re-raises any errors
 
 
+@lru_cache(maxsize=None)  # many files share the same timestamp
 def fmt_timestamp(time_string):
     """
     Parses the timestamp string from an XML document
     of the form "Thu Feb 27 16:38:54 PST 2014"
-    and returns a string of the form "2014".
+    and returns a tuple of ints of the form (2, 2014).
 
     """
+    # The format is fixed, so month and year can be read directly
+    # from their fields without a full date parse
+    fields = time_string.split()
+    try:
+        return MONTH_NUMBERS[fields[1]], int(fields[-1])
+    except (IndexError, KeyError, ValueError):  # unexpected format
+        pass
     # Remove platform-dependent timezone substring
     # of the general form "xxT"
-    tz_pattern = re.compile("\s[A-Z]{3}\s")
-    time_string = tz_pattern.sub(" ", time_string)
+    time_string = _TZ_RE.sub(" ", time_string)
 
     # Get the desired time info
     time_info = time.strptime(time_string, "%a %b %d %H:%M:%S %Y")
-    # year = str(time_info.tm_year)
-    return time_info
+    return time_info.tm_mon, time_info.tm_year
 
 
-def print_data(data, org_name, display=True):
+def print_data(data, category_names, org_name, display=True):
     """
-    Prints info from dictionary data in a specific format.
+    Prints info from dictionary data and category names (as returned
+    by get_file_list(), already in display order) in a specific format.
     Returns a dict with url information for every file
-    in desired categories, as well as a dict with md5 information for 
-    each file (keyed by file URL).
+    in desired categories, as well as a dict of Validation tuples
+    (md5, sizeInBytes) and a dict of file sizes in bytes (both keyed
+    by file URL).
 
     """
     print("\nQUERY RESULTS FOR '{}'\n".format(org_name))
     dict_to_get = {}
-    url_to_validate = defaultdict(dict)
-    for query_cat, v in sorted(iter(data.items()),
-                               key=lambda k_v: k_v[1]["catID"]):
+    url_to_validate = {}
+    url_to_size = {}
+    for catID, results in groupby(data.items(), key=lambda k_v: k_v[0][0]):
         print_list = []
-        if not v["results"]:
-            continue
-        catID = v["catID"]
         dict_to_get[catID] = {}
+        query_cat = category_names[catID]
         print_list.append(" {}: {} ".format(catID, query_cat).center(80, "="))
-        results = v["results"]
-        for sub_cat, items in sorted(iter(results.items()),
-                                     key=lambda sub_cat_items:
-                                     (sub_cat_items[0], sub_cat_items[1])):
+        for sub_cat, items in groupby(results, key=lambda k_v: k_v[0][1]):
             print_list.append("{}:".format(sub_cat))
-            for index, i in sorted(items.items()):
+            for (_, _, index), i in items:
                 integrity_tag = ""
                 url = i["url"]
                 dict_to_get[catID][index] = url
-                if "md5" in i:
-                    url_to_validate[url]["md5"] = i["md5"]
-                # the following elif takes care of MD5 > sizeInBytes rank-order
-                # in downstream processing
-                elif "sizeInBytes" in i:
-                    url_to_validate[url]["sizeInBytes"] = int(i["sizeInBytes"])
+                try:
+                    url_to_size[url] = int(i["sizeInBytes"])
+                except (KeyError, ValueError):
+                    url_to_size[url] = None
+                # the size is checked before the MD5 (and instead of it,
+                # with --fast_verify), so keep both when available
+                url_to_validate[url] = Validation(i.get("md5"), url_to_size[url])
                 print_index = " {}:[{}] ".format(str(catID), str(index))
-                date = fmt_timestamp(i["timestamp"])
-                date_string = "{:02d}/{}".format(date.tm_mon, date.tm_year)
+                month, year = fmt_timestamp(i["timestamp"])
+                date_string = "{:02d}/{}".format(month, year)
                 size_date = "[{}|{}]".format(i["size"], date_string)
                 filename = i["filename"]
                 margin = 80 - (len(size_date) + len(print_index))
@@ -441,7 +486,7 @@ def print_data(data, org_name, display=True):
             print('\n'.join(print_list))
             print()  # padding
 
-    return dict_to_get, url_to_validate
+    return dict_to_get, url_to_validate, url_to_size
 
 
 def get_user_choice():
@@ -476,26 +521,22 @@ def parse_selection(user_input):
     selections = {}
     parts = user_input.split(";")
     for p in parts:
-        if len(p.split(":")) > 2:
+        match = _SELECTION_RE.match(p)
+        if not match:
             clean_exit("FATAL ERROR: can't parse desired input\n?-->'{}'"
                       .format(p))
-        category, indices = p.split(":")
-        category = int(category)
-        selections[category] = []
-        cat_list = selections[category]
-        indices = indices.split(",")
-        for i in indices:
-            try:
-                cat_list.append(int(i))  # if it's already an integer
-            except ValueError:
-                try:
-                    start, stop = list(map(int, i.split("-")))
-                except:
-                    clean_exit("FATAL ERROR: can't parse desired "
-                              "input\n?-->'{}'".format(i))
-                add_range = list(range(start, stop + 1))
-                for e in add_range:
-                    cat_list.append(e)
+        category, indices = match.groups()
+        cat_list = selections.setdefault(int(category), [])
+        for i in indices.split(","):
+            match = _RANGE_RE.match(i.strip())
+            if not match:
+                clean_exit("FATAL ERROR: can't parse desired "
+                          "input\n?-->'{}'".format(i))
+            start, stop = match.groups()
+            if stop is None:  # single index
+                cat_list.append(int(start))
+            else:
+                cat_list.extend(range(int(start), int(stop) + 1))
     return selections
 
 
@@ -526,19 +567,30 @@ def get_org_name(xml_file):
 
     XML entry format is: <organismDownloads name="org_name">
 
+    The entry is the root element, so only the start of the
+    file is read.
+
     """
-    name_pattern = r"name=\"(.+)\""
-    org_line = None
-    with open(xml_file) as f:
-        for l in f:
-            if "organismDownloads" in l:  # standardized name indicator
-                org_line = l.strip()
-                break  # don't keep looking, already found
-    try:
-        org_name = re.search(name_pattern, org_line).group(1)
-        return org_name
-    except TypeError:  # org_line still None
+    with open(xml_file, "rb") as f:
+        head = f.read(8192)
+    match = _ORG_NAME_RE.search(head)
+    if match is None:
         return None
+    return match.group(1).decode("utf-8")
+
+
+def is_fresh(filename, max_age_hours):
+    """
+    Returns True if <filename> exists, isn't empty and was
+    last modified less than <max_age_hours> ago.
+
+    """
+    try:
+        file_stat = os.stat(filename)
+    except OSError:
+        return False
+    age = time.time() - file_stat.st_mtime
+    return file_stat.st_size > 0 and age < max_age_hours * 3600
 
 
 def is_xml(filename):
@@ -553,17 +605,11 @@ def is_xml(filename):
     Adapted from http://stackoverflow.com/a/13044946/3076552
 
     """
-    xml_hex = "\x3c"  # hex code at beginning of XML files
-    read_length = len(xml_hex)
-    with open(filename) as f:
-        try:
-            file_start = f.read(read_length)
-        except UnicodeDecodeError:  # compressed files
-            return False
-        if file_start.startswith(xml_hex):  # XML file
-            return True
-        else:  # hopefully all other file types
-            return False
+    xml_hex = b"\x3c"  # hex code at beginning of XML files
+    with open(filename, "rb") as f:  # binary; compressed files can't decode
+        file_start = f.read(len(xml_hex))
+    # True for XML files, hopefully False for all other file types
+    return file_start == xml_hex
 
 
 def hidden_xml_check(file_list):
@@ -588,31 +634,33 @@ def byte_convert(byte_size):
     format.
 
     """
-    # Calculate and display total size of selected data
-    adjusted = byte_size / (1024 * 1024)  # bytes to MB
-    if adjusted < 1:
-        adjusted = byte_size / 1024
-        unit = "KB"
-    elif adjusted < 1024:
-        unit = "MB"
-    else:
-        adjusted /= 1024
-        unit = "GB"
-    size_string = "{:.2f} {}".format(adjusted, unit)
+    # Pick the largest unit that leaves a value of at least 1; each
+    # unit is 10 bits, so this follows directly from the bit length
+    exponent = min(
+        len(SIZE_UNITS) - 1, max(0, (int(byte_size).bit_length() - 1) // 10))
+    adjusted = byte_size / (1 << (10 * exponent))
+    size_string = "{:.2f} {}".format(adjusted, SIZE_UNITS[exponent])
     return size_string
 
 
-def is_broken(filename, min_size_bytes=20, md5_hash=None, sizeInBytes=None):
+def is_broken(filename, min_size_bytes=20, md5_hash=None, sizeInBytes=None,
+              fast_verify=False):
     """
     Rudimentary check to see if a file appears to be broken.
+
+    Cheap checks are done first, so that the file is only
+    hashed if everything else looks correct. If <fast_verify>
+    is True, the MD5 check is skipped for files whose size
+    matches <sizeInBytes>.
     
     """
+    skip_md5 = fast_verify and sizeInBytes  # the size check decides
     if (
         not os.path.isfile(filename) or
         os.path.getsize(filename) < min_size_bytes or 
+        (not check_sizeInBytes(filename, sizeInBytes)) or
         (is_xml(filename) and not filename.lower().endswith("xml")) or
-        ((not check_md5(filename, md5_hash)) or 
-        (not check_sizeInBytes(filename, sizeInBytes)))
+        (not skip_md5 and not check_md5(filename, md5_hash))
     ):
         return True
     else:
@@ -620,9 +668,22 @@ def is_broken(filename, min_size_bytes=20, md5_hash=None, sizeInBytes=None):
 
 
 def get_md5(*fns, buffer_size=65536):
-    hash = md5()
+    """
+    Returns the MD5 hex digest of the combined contents of <fns>.
+
+    """
+    if len(fns) == 1 and hasattr(hashlib, "file_digest"):  # Python 3.11+
+        with open(fns[0], "rb") as f:
+            return hashlib.file_digest(f, "md5").hexdigest()
+    hash = hashlib.md5()
     for fn in fns:
         with open(fn, "rb") as f:
+            try:  # hash the whole file in a single call
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    hash.update(data)
+                continue
+            except (ValueError, OSError):  # empty or unmappable file
+                pass
             while True:
                 data = f.read(buffer_size)
                 if not data:
@@ -631,6 +692,17 @@ def get_md5(*fns, buffer_size=65536):
 
     return hash.hexdigest()
 
+
+@lru_cache(maxsize=None)
+def cached_md5(file_path, mtime_ns, size):
+    """
+    Caches get_md5() for <file_path>; <mtime_ns> and <size> are
+    part of the cache key so that changed files are hashed again.
+
+    """
+    return get_md5(file_path)
+
+
 def get_sizeInBytes(filename):
     try:
         file_sizeInBytes = os.path.getsize(filename)
@@ -644,7 +716,9 @@ def check_md5(filename, md5_hash, print_message=True):
         message = "INFO: No MD5 hash listed for {}; skipping check".format(filename)
         ret_val = True
     else:
-        file_md5 = get_md5(filename)
+        file_stat = os.stat(filename)
+        file_md5 = cached_md5(
+            os.path.abspath(filename), file_stat.st_mtime_ns, file_stat.st_size)
         if file_md5 == md5_hash:
             message = (
                 "SUCCESS: MD5 hashes match for {} ({})".format(filename, md5_hash))
@@ -655,7 +729,8 @@ def check_md5(filename, md5_hash, print_message=True):
             ret_val = False
     
     if print_message is True:
-        print(message)
+        # single write, as this may run in several threads at once
+        print(message + "\n", end="")
     
     return ret_val
 
@@ -675,12 +750,14 @@ def check_sizeInBytes(filename, sizeInBytes, print_message=True):
             ret_val = False
     
     if print_message is True:
-        print(message)
+        # single write, as this may run in several threads at once
+        print(message + "\n", end="")
     
     return ret_val
     
 
-def download_from_url(url, timeout=120, retry=0, min_file_bytes=20, url_to_validate={}):
+def download_from_url(url, timeout=120, retry=0, min_file_bytes=20, url_to_validate={},
+                      fast_verify=False):
     """
     Attempts to download a file from JGI servers using cURL.
 
@@ -688,35 +765,59 @@ def download_from_url(url, timeout=120, retry=0, min_file_bytes=20, url_to_valid
     
     """
     success = True
-    md5_hash = url_to_validate[url].get("md5", None)
-    sizeInBytes = url_to_validate[url].get("sizeInBytes", None)
+    md5_hash, sizeInBytes = url_to_validate.get(url, NO_VALIDATION)
 
+    filename = url_filename(url)
     url = url.replace("&amp;", "&")
 
-    filename = re.search('.+/(.+$)', url).group(1)
     url_prefix = "https://genome.jgi.doe.gov"
-    download_command = (
-        "curl -m {} '{}{}' -b cookies "
-        "> {}".format(timeout, url_prefix, url, filename)
-    )
-    if not is_broken(filename, md5_hash=md5_hash, sizeInBytes=sizeInBytes):
+    download_command = [
+        "curl", "-m", str(timeout), url_prefix + url, "-b", "cookies",
+        "--fail", "--compressed", "-o", filename
+    ]
+    if retry > 0:
+        # cURL retries transient errors (timeouts, HTTP 5xx) by itself
+        download_command[1:1] = ["--retry", str(retry), "--retry-delay", "10"]
+    if not is_broken(filename, md5_hash=md5_hash, sizeInBytes=sizeInBytes,
+                     fast_verify=fast_verify):
         success = True
-        print("Skipping existing file {}".format(filename))
+        # messages are written in one call each, as several threads
+        # may be downloading at once
+        print("Skipping existing file {}\n".format(filename), end="")
     else:
-        print("Downloading '{}' using command:\n{}"
-            .format(filename, download_command))
+        first_command = download_command
+        if (sizeInBytes and os.path.isfile(filename) and
+                0 < os.path.getsize(filename) < sizeInBytes and
+                not is_xml(filename)):
+            # shorter than expected, so likely a partial file from an
+            # earlier attempt; resume it (full-size or oversized broken
+            # files can't be resumed, and are downloaded again instead)
+            first_command = download_command + ["-C", "-"]
+        print("Downloading '{}' using command:\n{}\n"
+            .format(filename, format_command(first_command)), end="")
         # The next line doesn't appear to be needed to refresh the cookies.
         #    subprocess.call(login, shell=True)
-        status = subprocess.run(download_command, shell=True).returncode
+        status = subprocess.run(first_command).returncode
+        if status != 0 and first_command is not download_command:
+            # resuming failed (e.g. cURL exit code 33: server doesn't
+            # support it); start over from scratch
+            try:
+                os.remove(filename)
+            except OSError:
+                pass
+            status = subprocess.run(download_command).returncode
         if status != 0 or is_broken(
-            filename, min_file_bytes, md5_hash=md5_hash, sizeInBytes=sizeInBytes
+            filename, min_file_bytes, md5_hash=md5_hash, sizeInBytes=sizeInBytes,
+            fast_verify=fast_verify
         ):
             success = False
             if retry > 0:
                 # success = False
                 # this may be needed if initial download fails
-                alt_cmd = download_command.replace(
-                    "blocking=true", "blocking=false")
+                alt_cmd = [
+                    arg.replace("blocking=true", "blocking=false")
+                    for arg in download_command
+                ]
                 current_retry = 1
                 while current_retry <= retry:
                     if current_retry % 2 == 1:
@@ -724,12 +825,14 @@ def download_from_url(url, timeout=120, retry=0, min_file_bytes=20, url_to_valid
                     else:
                         retry_cmd = download_command
                     print(
-                        "Trying '{}' again due to download error ({}/{}):\n{}"
-                        .format(filename, current_retry, retry, retry_cmd)
+                        "Trying '{}' again due to download error ({}/{}):\n{}\n"
+                        .format(filename, current_retry, retry,
+                                format_command(retry_cmd)), end=""
                     )
-                    status = subprocess.run(retry_cmd, shell=True).returncode
+                    status = subprocess.run(retry_cmd).returncode
                     if status == 0 and not is_broken(
-                        filename, min_file_bytes, md5_hash=md5_hash, sizeInBytes=sizeInBytes
+                        filename, min_file_bytes, md5_hash=md5_hash, sizeInBytes=sizeInBytes,
+                        fast_verify=fast_verify
                     ):
                         success = True
                         break
@@ -739,6 +842,132 @@ def download_from_url(url, timeout=120, retry=0, min_file_bytes=20, url_to_valid
     return filename, download_command, success
 
 
+def url_filename(url):
+    """
+    Returns the local filename used for a file URL.
+
+    """
+    return url.replace("&amp;", "&").rsplit("/", 1)[-1]
+
+
+def run_login(login_cmd=None, **kwargs):
+    """
+    Runs the cURL login command <login_cmd> (LOGIN_ARGV by default),
+    passing the credentials in LOGIN_CONFIG on stdin. Extra keyword
+    arguments are passed to subprocess.run().
+
+    """
+    return subprocess.run(
+        login_cmd or LOGIN_ARGV, input=LOGIN_CONFIG, universal_newlines=True,
+        stdout=subprocess.DEVNULL, **kwargs)
+
+
+def refresh_login(interval=300):
+    """
+    Re-runs the cURL login every <interval> seconds in a background
+    thread, to keep the session cookie fresh during long downloads.
+    Returns a threading.Event which stops the refreshing once set.
+
+    Each new cookie jar is written to a separate file and then moved
+    over "cookies" in one step, so cURL processes started in the
+    meantime never read a partially-written jar.
+
+    """
+    stop = threading.Event()
+    new_jar = "cookies.new"
+    jar_index = LOGIN_ARGV.index("-c") + 1
+    login_argv = LOGIN_ARGV[:jar_index] + [new_jar] + LOGIN_ARGV[jar_index + 1:]
+
+    def refresh():
+        while not stop.wait(interval):
+            status = run_login(login_argv).returncode
+            try:
+                if status == 0:
+                    os.replace(new_jar, "cookies")
+                else:
+                    os.remove(new_jar)
+            except OSError:
+                pass
+
+    threading.Thread(target=refresh, daemon=True).start()
+    return stop
+
+
+def format_command(command):
+    """
+    Returns a printable, shell-quoted string for a command given as
+    a list of arguments.
+
+    """
+    return " ".join(shlex.quote(arg) for arg in command)
+
+
+@lru_cache(maxsize=None)
+def curl_version():
+    """
+    Returns the (major, minor) version of the installed cURL, or
+    None if it can't be determined.
+
+    """
+    try:
+        version_info = subprocess.run(
+            ["curl", "--version"], stdout=subprocess.PIPE,
+            universal_newlines=True).stdout
+    except OSError:
+        return None
+    match = _CURL_VERSION_RE.match(version_info)
+    if not match:
+        return None
+    return tuple(map(int, match.groups()))
+
+
+def curl_config_quote(value):
+    """
+    Escapes a string for use as a double-quoted value in a cURL
+    config file.
+
+    """
+    return value.replace("\\", "\\\\").replace('"', '\\"')
+
+
+def batch_download(url_list, timeout=120, max_parallel=4):
+    """
+    Downloads every file in <url_list> not already present locally
+    using a single cURL process, so that one connection to the server
+    is reused for all files instead of reconnecting for each one. If
+    cURL supports it, up to <max_parallel> transfers are run at once.
+
+    Files are not checked here; download_from_url() verifies (and
+    re-downloads, if needed) each file afterwards.
+
+    """
+    url_prefix = "https://genome.jgi.doe.gov"
+    config_lines = []
+    filenames = set()
+    for url in url_list:
+        filename = url_filename(url)
+        url = url.replace("&amp;", "&")
+        # skip existing files, and don't fetch the same filename twice
+        if filename in filenames or os.path.isfile(filename):
+            continue
+        filenames.add(filename)
+        config_lines.append('url = "{}"'.format(curl_config_quote(url_prefix + url)))
+        config_lines.append('output = "{}"'.format(curl_config_quote(filename)))
+    if not filenames:
+        return
+    batch_command = [
+        "curl", "-m", str(timeout), "-b", "cookies", "--fail", "--compressed",
+        "-K", "-"
+    ]
+    version = curl_version()
+    if max_parallel > 1 and version is not None and version >= (7, 66):
+        batch_command[1:1] = ["--parallel", "--parallel-max", str(max_parallel)]
+    print("Downloading {} files using command:\n{}"
+          .format(len(filenames), format_command(batch_command)))
+    subprocess.run(batch_command, input="\n".join(config_lines) + "\n",
+                   universal_newlines=True)
+
+
 def get_regex():
     """
     Get regex pattern from user, compile and return.
@@ -767,8 +996,8 @@ def retry_from_failed(login_cmd, fail_log, timeout=120, retries=3):
     fail_log = open(fail_log, 'r')
     url_list = fail_log.read().splitlines()
     try:  # fails if unable to contact server
-        subprocess.check_output(login_cmd, shell=True)
-    except subprocess.CalledProcessError as error:
+        run_login(login_cmd, check=True)
+    except (subprocess.CalledProcessError, OSError):
         clean_exit("Couldn't connect with server. Please check Internet "
                   "connection and retry.")
     downloaded, failed = download_list(url_list)
@@ -793,10 +1022,13 @@ def log_failed(organism, failed_urls):
         f.write('\n'.join(failed_urls))
 
 
-def download_list(url_list, url_to_validate={}, timeout=120, retries=3):
+def download_list(url_list, url_to_validate={}, timeout=120, retries=3,
+                  max_workers=4, fast_verify=False):
     """
     Attempts download command on a list of partial file
-    URLs (completed by download_from_url()).
+    URLs (completed by download_from_url()). Up to <max_workers>
+    files are downloaded at once, and then checked (and
+    re-downloaded, if needed) by as many threads.
 
     Returns a list of successfully-downloaded files and a
     list of unsuccessful URLs
@@ -808,21 +1040,39 @@ def download_list(url_list, url_to_validate={}, timeout=120, retries=3):
     downloaded_files = []
     broken_urls = []
     broken_files = []
-    subprocess.run(LOGIN_STRING, shell=True)
-    start_time = time.time()
-    for url in url_list:
-        current_time = time.time()
-        # refresh the session cookie every 5 minutes
-        if current_time - start_time > 300:
-            subprocess.run(LOGIN_STRING, shell=True)
-            start_time = time.time()
-        fn, cmd, success = download_from_url(
-            url, timeout=timeout, retry=retries, url_to_validate=url_to_validate)
-        if not success:
-            broken_urls.append(url)
-            broken_files.append(fn)
-        else:
-            downloaded_files.append(fn)
+    # the session cookie is reused if it was set within the last 5 minutes
+    # (e.g. by the login that fetched the XML index)
+    if not is_fresh("cookies", 5 / 60):
+        run_login()
+    # refresh the session cookie every 5 minutes
+    stop_refresh = refresh_login(300)
+    try:
+        batch_download(url_list, timeout=timeout, max_parallel=max_workers)
+        # check each file, re-downloading any that are missing or broken.
+        # URLs sharing a filename are handled in order by the same worker,
+        # since they would otherwise write to the same file at once
+        url_groups = defaultdict(list)
+        for url in url_list:
+            url_groups[url_filename(url)].append(url)
+
+        def download_group(urls):
+            return [
+                (url, download_from_url(
+                    url, timeout=timeout, retry=retries,
+                    url_to_validate=url_to_validate, fast_verify=fast_verify))
+                for url in urls
+            ]
+
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            for results in executor.map(download_group, url_groups.values()):
+                for url, (fn, cmd, success) in results:
+                    if not success:
+                        broken_urls.append(url)
+                        broken_files.append(fn)
+                    else:
+                        downloaded_files.append(fn)
+    finally:
+        stop_refresh.set()
     # in cases where multiple files with same name are present and any of them 
     # succeed, we can remove corresponding URLs from the list of broken URLs
     # (otherwise, they would just overwrite one another). 
@@ -840,6 +1090,21 @@ def download_list(url_list, url_to_validate={}, timeout=120, retries=3):
 
 # BLURBS
 
+user_setup_blurb = """
+=== USER SETUP ===
+
+JGI access configuration:
+
+Before continuing, you will need to provide your JGI login credentials.
+These are required by JGI's curl api, and will be stored in a config
+file for future use (unless you choose to delete them).
+
+If you need to sign up for a JGI account, use the registration link at
+https://contacts.jgi.doe.gov/registration/new
+
+=== CREDENTIALS ===
+"""
+
 usage_example_blurb = """\
 This script will retrieve files from JGI using the cURL api. It will
 return a list of possible files for downloading.
@@ -961,6 +1226,18 @@ parser.add_argument("-u", "--usage", action='store_true',
 parser.add_argument("-n", "--retry_n", type=int, default=4,
                     help=("number of times to retry downloading files with "
                     "errors (0 to skip such files)"))
+parser.add_argument("-p", "--parallel", type=int, default=4,
+                    help="maximum number of files to download at once")
+parser.add_argument("--fast_verify", action='store_true',
+                    help="skip the MD5 check for downloaded files whose size "
+                         "matches the size listed by JGI")
+parser.add_argument("--xml_ttl", type=float, default=24, metavar="HOURS",
+                    help="reuse a previously fetched xml index for the query "
+                         "(kept as a temporary file) if it is less than "
+                         "HOURS old")
+parser.add_argument("--refresh_xml", action='store_true',
+                    help="always retrieve a new copy of the xml index from "
+                         "JGI, even if a recent copy exists")
 parser.add_argument(
     "-l", "--load_failed", type=str, metavar="logfile",
     help="retry downloading from URLs listed in log file")
@@ -1041,16 +1318,20 @@ PASSWORD = config_info["password"]
 #                 "login={}\&password={} -b cookies -c cookies > "
 #                 "/dev/null".format(USER, PASSWORD))
 
-# New syntax
-LOGIN_STRING = (
-    # "curl 'https://signon-old.jgi.doe.gov/signon/create' "
-    "curl 'https://signon.jgi.doe.gov/signon/create' "
-    "--data-urlencode 'login={}' "
-    "--data-urlencode 'password={}' "
-    "-s "  # suppress status output
-    "-c cookies > /dev/null"
-    .format(USER, PASSWORD)
-    )
+# New syntax (as an argument list, run without a shell); the credentials
+# are read by cURL from a config on stdin (see run_login()), so they don't
+# show up in the process list
+LOGIN_ARGV = [
+    # "https://signon-old.jgi.doe.gov/signon/create",
+    "curl", "https://signon.jgi.doe.gov/signon/create",
+    "-K", "-",  # read LOGIN_CONFIG from stdin
+    "-s",  # suppress status output
+    "-c", "cookies"
+]
+LOGIN_CONFIG = (
+    'data-urlencode = "login={}"\n'
+    'data-urlencode = "password={}"\n'.format(
+        curl_config_quote(USER), curl_config_quote(PASSWORD)))
 
 LOCAL_XML = False
 
@@ -1062,7 +1343,7 @@ if args.load_failed:
         RETRY_FROM_LOG = f.read().splitlines()
     # logfile = args.load_failed
     # print("Reading URLs from \'{}\'".format(logfile))
-    # downloaded, failed = retry_from_failed(LOGIN_STRING, logfile)
+    # downloaded, failed = retry_from_failed(LOGIN_ARGV, logfile)
     # clean_exit("All files in log attempted.")
 else:
     org_input = args.organism_abbreviation
@@ -1079,10 +1360,9 @@ if not org_input:
             sys.exit("No organism specified. Exiting now.")
     else:
         sys.exit("No organism specified. Exiting now.")
-org_regex = re.compile(r'\.jgi.+\.(?:gov|org).*\/(.+)\/(?!\/)')
 try:  # see if it's in address form
     # organism = re.search("\.jgi.+\.(?:gov|org)/(.+)/", org_input).group(1)
-    organism = org_regex.search(org_input).group(1)
+    organism = _ORG_ADDR_RE.search(org_input).group(1)
 except AttributeError:  # not in address form, assume string is organism name
     organism = org_input
 
@@ -1090,7 +1370,9 @@ except AttributeError:  # not in address form, assume string is organism name
 org_url = ("https://genome.jgi.doe.gov/portal/ext-api/downloads/get-directory?"
            "organism={}".format(organism))
 
-# Get xml index of files, using existing local file or curl API
+# Get xml index of files, using existing local file, a recently
+# fetched copy or curl API
+cached_index_filename = "{}_jgi_index.xml".format(organism)
 if args.xml:
     LOCAL_XML = True  # global referenced by clean_exit()
     xml_arg = args.xml
@@ -1101,54 +1383,80 @@ if args.xml:
     print(
         "Retrieving information from JGI for query "
         "'{}' using local file '{}'\n".format(organism, xml_index_filename))
+elif not args.refresh_xml and is_fresh(cached_index_filename, args.xml_ttl):
+    xml_index_filename = cached_index_filename
+    print(
+        "Retrieving information from JGI for query '{}' using file '{}' "
+        "fetched within the last {:g} hours (use --refresh_xml to fetch a new "
+        "copy)\n".format(organism, xml_index_filename, args.xml_ttl))
 else:  # fetch XML file from JGI
-    xml_index_filename = "{}_jgi_index.xml".format(organism)
+    xml_index_filename = cached_index_filename
 
     # Old syntax
     # xml_address = ("curl {} -b cookies -c cookies > {}"
     #                .format(org_url, xml_index_filename))
 
     # New syntax
-    xml_address = ("curl '{}' -L -b cookies > {}"
-                   .format(org_url, xml_index_filename))
+    # -s (from LOGIN_ARGV, below) applies to every transfer of the combined
+    # command, so no progress is shown for the index; -S keeps errors visible
+    xml_address = [
+        "curl", org_url, "-L", "-b", "cookies", "--compressed", "-s", "-S"
+    ]
+    if (not args.refresh_xml and os.path.isfile(xml_index_filename)
+            and os.path.getsize(xml_index_filename) > 0):
+        # older copy exists; only download the index if it has changed
+        # since (otherwise the server responds "304 Not Modified")
+        xml_address += ["-z", xml_index_filename]
+    xml_address += ["-o", xml_index_filename]
+    # log in and fetch the index with a single cURL process, so both
+    # requests share one connection (the new session cookie is passed
+    # on in memory); --fail-early stops if the login fails
+    login_and_fetch = (
+        ["curl", "--fail-early", "-S"] + LOGIN_ARGV[1:]
+        + ["-o", os.devnull, "--next"]
+        + xml_address[1:])
+    print(
+        "Retrieving information from JGI for query '{}' using command "
+        "'{}'\n".format(organism, format_command(xml_address)))
     try:  # fails if unable to contact server
-        subprocess.check_output(LOGIN_STRING, shell=True)
-    except subprocess.CalledProcessError as error:
+        run_login(login_and_fetch, check=True)
+    except (subprocess.CalledProcessError, OSError):
         clean_exit("Couldn't connect with server. Please check Internet "
                   "connection and retry.")
-    print(
-        "Retrieving information from JGI for query '{}' using command "
-        "'{}'\n".format(organism, xml_address))
-    subprocess.run(xml_address, shell=True)
+    if os.path.isfile(xml_index_filename):
+        # now known to be current, even if unchanged (see --xml_ttl)
+        os.utime(xml_index_filename)
     print()  # padding
 
 
 # Parse xml file for content to download
-xml_root = None
-if os.path.getsize(xml_index_filename) == 0:  # happens if user and/or pw wrong
+# missing or empty if user and/or pw wrong
+if not os.path.isfile(xml_index_filename) or os.path.getsize(xml_index_filename) == 0:
     clean_exit("Invalid username/password combination (or other issue).\n"
               "Restart script with flag '-c' to reconfigure credentials.")
-try:
-    xml_in = ET.ElementTree(file=xml_index_filename)
-    xml_root = xml_in.getroot()
-except ET.ParseError:  # organism not found/xml file contains errors
-    clean_exit("Cannot parse XML file or no organism match found.\n"
-              "Ensure remote file exists and has content at the "
-              "following address:\n{}".format(org_url))
 
 
 # Get categories from config (including possible user additions)
 # Will only be used if --filter_files flag
 DESIRED_CATEGORIES = config_info["categories"]
+# for fast membership tests in IndexHandler
+DESIRED_CATEGORIES_SET = frozenset(DESIRED_CATEGORIES or ())
 
 
 # Choose between different XML parsers
 # if args.filter_files, user wants only those files in <desired_categories>
-file_list = get_file_list(xml_index_filename, filter_categories=args.filter_files)
+# (the index is only parsed once, here; a malformed file raises part-way)
+try:
+    file_list, category_names = get_file_list(
+        xml_index_filename, filter_categories=args.filter_files)
+except XML_PARSE_ERRORS:  # organism not found/xml file contains errors
+    clean_exit("Cannot parse XML file or no organism match found.\n"
+              "Ensure remote file exists and has content at the "
+              "following address:\n{}".format(org_url))
 
 
 # Check if file has any categories of interest
-if not any(v["results"] for v in list(file_list.values())):
+if not file_list:
     print(("ERROR: no results found for '{}' in any of the following "
            "categories:\n---\n{}\n---"
            .format(organism, "\n".join(DESIRED_CATEGORIES))))
@@ -1171,7 +1479,8 @@ elif RETRY_FROM_LOG is not None:
     display_info = False
 
 
-url_dict, url_to_validate = print_data(file_list, organism, display=display_info)
+url_dict, url_to_validate, file_sizes = print_data(
+    file_list, category_names, organism, display=display_info)
 
 if not user_choice:
     # Ask user which files to download from xml
@@ -1179,33 +1488,28 @@ if not user_choice:
     if user_choice == 'r':
         regex_filter = get_regex()
 
-urls_to_get = set()
-
 # special case for downloading all available files
 # or filtering with a regular expression
+# (sets, as the same URL may be listed or selected more than once)
 if user_choice in ("a", "r", "l"):
-    for k, v in sorted(url_dict.items()):
-        for u in v.values():
-            if regex_filter:
-                fn = re.search(r".+/([^\/]+$)", u).group(1)
-                match = regex_filter.search(fn)
-                if not match:
-                    continue
-            elif user_choice == "l" and u not in RETRY_FROM_LOG:
-                continue
-            urls_to_get.add(u)
+    all_urls = (u for v in url_dict.values() for u in v.values())
+    if regex_filter:
+        urls_to_get = {
+            u for u in all_urls if regex_filter.search(u.rsplit("/", 1)[-1])}
+    elif user_choice == "l":
+        retry_urls = set(RETRY_FROM_LOG)
+        urls_to_get = {u for u in all_urls if u in retry_urls}
+    else:
+        urls_to_get = set(all_urls)
 else:
     # Retrieve user-selected file urls from dict
     ids_dict = parse_selection(user_choice)
-    for k, v in sorted(ids_dict.items()):
-        for i in v:
-            urls_to_get.add(url_dict[k][i])
+    urls_to_get = {url_dict[k][i] for k, v in ids_dict.items() for i in v}
 
 
 # Calculate and display total size of selected data
 urls_to_get = sorted(urls_to_get)
-filenames = [u.split("/")[-1] for u in urls_to_get]
-file_sizes = get_sizes(file_list, sizes_by_url={})
+filenames = [u.rsplit("/", 1)[-1] for u in urls_to_get]
 total_size = sum(filter(None, [file_sizes[url] for url in urls_to_get]))
 size_string = byte_convert(total_size)
 num_files = len(urls_to_get)
@@ -1220,7 +1524,8 @@ if INTERACTIVE:
         clean_exit("ABORTING DOWNLOAD")
 
 downloaded_files, failed_urls = download_list(
-    urls_to_get, url_to_validate=url_to_validate, retries=args.retry_n)
+    urls_to_get, url_to_validate=url_to_validate, retries=args.retry_n,
+    max_workers=args.parallel, fast_verify=args.fast_verify)
 
 print("Finished downloading {} files.".format(len(downloaded_files)))
 
@@ -1230,7 +1535,8 @@ if failed_urls and INTERACTIVE:
         "{} files failed to download; retry them? (y/n): ".format(n_broken))
     if retry_broken.lower() in ("yes", "y"):
         downloaded_files, failed_urls = download_list(
-            failed_urls, url_to_validate=url_to_validate, retries=1)
+            failed_urls, url_to_validate=url_to_validate, retries=1,
+            max_workers=args.parallel, fast_verify=args.fast_verify)
 
 # Kindly offer to unpack files, if files remain after error check
 if downloaded_files and INTERACTIVE: